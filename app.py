@@ -1,10 +1,33 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+from flask.json.provider import JSONProvider
+from a2wsgi import WSGIMiddleware
 import sqlite3
+import json
+import hashlib
+import orjson
+import fastjsonschema
 import os
+import queue
+import threading
+from collections import defaultdict
 from functools import wraps
 import logging
 
+class ORJSONProvider(JSONProvider):
+    """JSON provider that serializes with orjson, used by jsonify and request.get_json.
+
+    Request bodies are still parsed with the stdlib json module, which accepts
+    NaN, Infinity and out-of-range numbers such as 1e999 that orjson rejects.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return json.loads(s)
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 logging.basicConfig(level=logging.INFO)
 
 VALID_MEASURES = {
@@ -22,48 +45,229 @@ VALID_MEASURES = {
     'Daily fine particulate matter'
 }
 
+# Five ASCII digits; the request schema's zip and zips item pattern
+ZIP_PATTERN = '^[0-9]{5}$'
+
+# Most ZIP codes accepted in one bulk /county_data request
+MAX_BULK_ZIPS = 100
+
+# Compiled once into a plain Python function that raises JsonSchemaValueException.
+# allOf is checked in order, so zip errors are reported before measure_name ones.
+validate_county_request = fastjsonschema.compile({
+    "type": "object",
+    "allOf": [
+        {"anyOf": [{"required": ["zip"]}, {"required": ["zips"]}]},
+        {"not": {"required": ["zip", "zips"]}},
+        {"properties": {
+            "zip": {"type": "string", "pattern": ZIP_PATTERN},
+            "zips": {
+                "type": "array",
+                "minItems": 1,
+                "maxItems": MAX_BULK_ZIPS,
+                "items": {"type": "string", "pattern": ZIP_PATTERN},
+            },
+        }},
+        {"required": ["measure_name"]},
+        {"properties": {"measure_name": {"enum": sorted(VALID_MEASURES)}}},
+    ],
+})
+
+# Static response bodies, serialized once instead of on every request
+MEASURES_JSON = app.json.dumps({"measures": sorted(VALID_MEASURES)})
+_tables_json = None
+
+# Serializes the one-time builds of the lazily filled caches below
+_cache_lock = threading.Lock()
+
+# Static responses never change while the process runs, so clients may cache them
+STATIC_CACHE_CONTROL = 'public, max-age=86400, immutable'
+
+def etag_for(body):
+    """Get the ETag for a static response body"""
+    return hashlib.md5(body.encode(), usedforsecurity=False).hexdigest()
+
+MEASURES_ETAG = etag_for(MEASURES_JSON)
+
+# ZIP -> [(county, state_abbreviation, state_code)], loaded once from zip_county
+_zip_map = None
+
+# Response keys for county_data rows, in COUNTY_DATA_STMT's column order after c.key
+COLUMNS = (
+    'confidence_interval_lower_bound',
+    'confidence_interval_upper_bound',
+    'county',
+    'county_code',
+    'data_release_year',
+    'denominator',
+    'fipscode',
+    'measure_id',
+    'measure_name',
+    'numerator',
+    'raw_value',
+    'state',
+    'state_code',
+    'year_span',
+)
+
+# Hot-path statement is a module constant so every call passes the same
+# string and sqlite3's per-connection statement cache reuses the compiled plan.
+# Takes the requested ZIPs' counties as a JSON array of [county, state, state_code]
+# entries and returns their health rows in a single query, each prefixed with
+# the position of the county entry it matched.
+COUNTY_DATA_STMT = """
+    SELECT 
+        c.key,
+        chr.confidence_interval_lower_bound,
+        chr.confidence_interval_upper_bound,
+        chr.county,
+        chr.county_code,
+        chr.data_release_year,
+        chr.denominator,
+        chr.fipscode,
+        chr.measure_id,
+        chr.measure_name,
+        chr.numerator,
+        chr.raw_value,
+        chr.state,
+        chr.state_code,
+        chr.year_span
+    FROM json_each(?) c
+    JOIN county_health_rankings chr
+        ON chr.county = json_extract(c.value, '$[0]')
+        AND (chr.state = json_extract(c.value, '$[1]') OR chr.state_code = json_extract(c.value, '$[2]'))
+    WHERE chr.measure_name = ?
+    ORDER BY c.key, chr.year_span DESC
+"""
+
+# Source for the in-memory ZIP -> counties map, in (zip, county) order.
+# zip_county rows are unique per (zip, county, state, county_code), so no
+# DISTINCT is needed and the covering index supplies the ordering.
+ZIP_MAP_STMT = """
+    SELECT zip, county, state_abbreviation, substr(county_code, 1, 2)
+    FROM zip_county
+    ORDER BY zip, county
+"""
+
+# Idle read connections shared by all threads. Servers that start a thread per
+# request (like app.run) still reuse connections instead of opening new ones.
+POOL_SIZE = 16
+_pool = queue.Queue(maxsize=POOL_SIZE)
+
+# Pinned explicitly rather than relying on the interpreter's default
+STATEMENT_CACHE_SIZE = 128
+
+# The API only reads, and data.db is rebuilt offline by csv_to_sqlite.py, so it
+# is opened read-only and immutable: SQLite skips file locking and change
+# detection entirely. Restart the app after reloading the database.
+DATABASE_URI = 'file:data.db?mode=ro&immutable=1'
+
+CONNECTION_PRAGMAS = (
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=1073741824",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA threads=4",
+)
+
 def get_db():
-    """Get database connection with row factory"""
+    """Take an idle database connection from the pool, opening one if none is idle"""
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        pass
     try:
         # Use data.db instead of county_health.db
-        db = sqlite3.connect('data.db')
-        db.row_factory = sqlite3.Row
+        db = sqlite3.connect(
+            DATABASE_URI,
+            uri=True,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        for pragma in CONNECTION_PRAGMAS:
+            db.execute(pragma)
         return db
     except sqlite3.Error as e:
         app.logger.error(f"Database connection error: {e}")
         return None
 
+def release_db(db):
+    """Return a connection taken with get_db() to the pool, closing it if the pool is full"""
+    try:
+        _pool.put_nowait(db)
+    except queue.Full:
+        db.close()
+
 def get_table_info():
     """Get information about tables and their columns"""
+    db = None
     try:
         db = get_db()
         if not db:
             return None
         
         cursor = db.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = cursor.fetchall()
+        cursor.execute("""
+            SELECT m.name, p.name, p.type
+            FROM sqlite_master m
+            JOIN pragma_table_info(m.name) p
+            WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'
+            ORDER BY m.rowid, p.cid
+        """)
         
-        table_info = {}
-        for table in tables:
-            table_name = table[0]
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = cursor.fetchall()
-            table_info[table_name] = {
-                'columns': [col[1] for col in columns],
-                'types': {col[1]: col[2] for col in columns}
-            }
+        table_info = defaultdict(lambda: {'columns': [], 'types': {}})
+        for table_name, column_name, column_type in cursor.fetchall():
+            table = table_info[table_name]
+            table['columns'].append(column_name)
+            table['types'][column_name] = column_type
         
-        return table_info
+        return dict(table_info)
     except sqlite3.Error as e:
         app.logger.error(f"Error getting table info: {e}")
         return None
     finally:
         if db:
-            db.close()
+            release_db(db)
+
+def get_tables_json():
+    """Get serialized table info and its ETag, built on first use since the schema is fixed at runtime"""
+    global _tables_json
+    if _tables_json is None:
+        with _cache_lock:
+            if _tables_json is None:
+                table_info = get_table_info()
+                if table_info is None:
+                    return None
+                body = app.json.dumps(table_info)
+                _tables_json = (body, etag_for(body))
+    return _tables_json
+
+def get_zip_map():
+    """Get the ZIP to counties map, loaded on first use since zip_county is fixed at runtime"""
+    global _zip_map
+    if _zip_map is None:
+        with _cache_lock:
+            if _zip_map is None:
+                db = None
+                try:
+                    db = get_db()
+                    if not db:
+                        return None
+                    
+                    zip_map = defaultdict(list)
+                    for zip_code, county, state_abbr, state_code in db.execute(ZIP_MAP_STMT):
+                        zip_map[zip_code].append((county, state_abbr, state_code))
+                    _zip_map = dict(zip_map)
+                except sqlite3.Error as e:
+                    app.logger.error(f"Error loading ZIP map: {e}")
+                    return None
+                finally:
+                    if db:
+                        release_db(db)
+    return _zip_map
 
 def get_valid_measures():
     """Get list of valid measure names from the database"""
+    db = None
     try:
         db = get_db()
         if not db:
@@ -84,7 +288,26 @@ def get_valid_measures():
         return None
     finally:
         if db:
-            db.close()
+            release_db(db)
+
+def schema_error(e):
+    """Map a request schema violation to the API's error body"""
+    if e.name == 'data.zip':
+        return {"error": "zip must be a 5-digit string"}
+    if e.name.startswith('data.zips'):
+        return {"error": f"zips must be a list of 1 to {MAX_BULK_ZIPS} 5-digit strings"}
+    if e.rule == 'anyOf':
+        return {"error": "zip or zips is required"}
+    if e.rule == 'not':
+        return {"error": "Send either zip or zips, not both"}
+    if e.name == 'data.measure_name':
+        return {
+            "error": "Invalid measure_name",
+            "valid_measures": sorted(list(VALID_MEASURES))
+        }
+    if e.rule == 'required':
+        return {"error": f"{e.definition['required'][0]} is required"}
+    return {"error": "Request body must be a JSON object"}
 
 def validate_request(f):
     @wraps(f)
@@ -95,84 +318,55 @@ def validate_request(f):
         data = request.get_json()
         
         # Check for teapot easter egg
-        if data.get('coffee') == 'teapot':
+        if isinstance(data, dict) and data.get('coffee') == 'teapot':
             return '', 418
         
-        # Validate required fields
-        if 'zip' not in data:
-            return jsonify({"error": "zip is required"}), 400
-        
-        zip_code = data['zip']
-        if not (isinstance(zip_code, str) and zip_code.isdigit() and len(zip_code) == 5):
-            return jsonify({"error": "zip must be a 5-digit string"}), 400
-        
-        if 'measure_name' not in data:
-            return jsonify({"error": "measure_name is required"}), 400
-        
-        measure_name = data['measure_name']
-        if measure_name not in VALID_MEASURES:
-            return jsonify({
-                "error": "Invalid measure_name",
-                "valid_measures": sorted(list(VALID_MEASURES))
-            }), 400
+        # Validate required fields in one compiled check
+        try:
+            validate_county_request(data)
+        except fastjsonschema.JsonSchemaValueException as e:
+            return jsonify(schema_error(e)), 400
         
         return f(*args, **kwargs)
     return decorated_function
 
-def get_county_data(zip_code, measure_name):
-    """Get county health data for a given ZIP code and measure"""
+def get_county_data(zip_codes, measure_name):
+    """Get county health data for the given ZIP codes and measure, keyed by ZIP code"""
+    db = None
     try:
+        zip_map = get_zip_map()
+        if zip_map is None:
+            return None
+        
+        # Each distinct county is queried once, however many of the ZIPs share it
+        results = {zip_code: [] for zip_code in zip_codes}
+        counties = []
+        county_index = {}
+        for zip_code in results:
+            for county in zip_map.get(zip_code, ()):
+                if county not in county_index:
+                    county_index[county] = len(counties)
+                    counties.append(county)
+        
+        if not counties:
+            return results
+        
         db = get_db()
         if not db:
             return None
         
         cursor = db.cursor()
+        cursor.execute(COUNTY_DATA_STMT, (orjson.dumps(counties).decode(), measure_name))
         
-        # Get county information for the ZIP code
-        cursor.execute("""
-            SELECT DISTINCT zc.county, zc.state_abbreviation, zc.county_code
-            FROM zip_county zc
-            WHERE zc.zip = ?
-        """, (zip_code,))
-        
-        county_results = cursor.fetchall()
-        if not county_results:
-            return []
+        county_rows = [[] for _ in counties]
+        for row in cursor.fetchall():
+            county_rows[row[0]].append(dict(zip(COLUMNS, row[1:])))
         
-        # Get health data for each matching county
-        results = []
-        for county_row in county_results:
-            county, state_abbr, county_code = county_row
-            
-            cursor.execute("""
-                SELECT 
-                    confidence_interval_lower_bound,
-                    confidence_interval_upper_bound,
-                    county,
-                    county_code,
-                    data_release_year,
-                    denominator,
-                    fipscode,
-                    measure_id,
-                    measure_name,
-                    numerator,
-                    raw_value,
-                    state,
-                    state_code,
-                    year_span
-                FROM county_health_rankings
-                WHERE county = ? 
-                AND (state = ? OR state_code = ?)
-                AND measure_name = ?
-                ORDER BY year_span DESC
-            """, (county, state_abbr, county_code[:2], measure_name))
-            
-            columns = [column[0].lower() for column in cursor.description]
-            rows = cursor.fetchall()
-            
-            for row in rows:
-                result = dict(zip(columns, [str(val) if val is not None else "" for val in row]))
-                results.append(result)
+        # Each ZIP lists its counties in its own map order, as a single-ZIP lookup does,
+        # whatever other ZIPs share the request
+        for zip_code in results:
+            for county in zip_map.get(zip_code, ()):
+                results[zip_code].extend(county_rows[county_index[county]])
         
         return results
     except sqlite3.Error as e:
@@ -180,39 +374,56 @@ def get_county_data(zip_code, measure_name):
         return None
     finally:
         if db:
-            db.close()
+            release_db(db)
 
 @app.route('/county_data', methods=['POST'])
 @validate_request
 def county_data():
     """Handle POST requests to /county_data endpoint"""
     data = request.get_json()
-    zip_code = data['zip']
     measure_name = data['measure_name']
     
+    # A bulk request names several ZIP codes and gets rows keyed by ZIP code
+    bulk = 'zips' in data
+    zip_codes = data['zips'] if bulk else [data['zip']]
+    
     # Get the data
-    results = get_county_data(zip_code, measure_name)
+    results = get_county_data(zip_codes, measure_name)
     
     if results is None:
         return jsonify({"error": "Database error occurred"}), 500
     
-    if len(results) == 0:
+    if not any(results.values()):
         return jsonify({"error": "No data found for the given parameters"}), 404
     
-    return jsonify(results)
+    if not bulk:
+        results = results[data['zip']]
+    
+    return Response(orjson.dumps(results), mimetype='application/json')
+
+def static_json_response(body, etag):
+    """Build a cacheable JSON response, or an empty 304 if the client's copy is current"""
+    # If-None-Match uses weak comparison, so W/"<etag>" from a proxy also matches
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = STATIC_CACHE_CONTROL
+    return response
 
 @app.route('/measures', methods=['GET'])
 def get_measures():
     """Get all available measure names"""
-    return jsonify({"measures": sorted(list(VALID_MEASURES))})
+    return static_json_response(MEASURES_JSON, MEASURES_ETAG)
 
 @app.route('/tables', methods=['GET'])
 def get_tables():
     """Get information about database tables and their structure"""
-    table_info = get_table_info()
-    if table_info is None:
+    tables_json = get_tables_json()
+    if tables_json is None:
         return jsonify({"error": "Database error occurred"}), 500
-    return jsonify(table_info)
+    return static_json_response(*tables_json)
 
 @app.errorhandler(404)
 def not_found(e):
@@ -226,13 +437,29 @@ def bad_request(e):
 def server_error(e):
     return jsonify({"error": "Internal server error"}), 500
 
+# Build the static caches at import so WSGI/ASGI workers don't build them on
+# their first requests; a failure is logged and retried on first use
+get_zip_map()
+get_tables_json()
+
+# ASGI entry point for event-loop servers: uvicorn app:asgi_app --workers N.
+# Each request runs on a pool of ASGI_THREADS threads, so one worker serves
+# that many lookups concurrently, drawing connections from the shared pool.
+ASGI_THREADS = 10
+asgi_app = WSGIMiddleware(app, workers=ASGI_THREADS)
+
 if __name__ == '__main__':
     # Check database connection on startup
     db = get_db()
     if not db:
         app.logger.error("Failed to connect to database on startup")
         exit(1)
-    db.close()
+    release_db(db)
+    
+    # Load the ZIP map before serving the first request
+    if get_zip_map() is None:
+        app.logger.error("Failed to load ZIP map on startup")
+        exit(1)
     
     # Start server
     app.run(host='0.0.0.0', port=8080)
@@ -4,6 +4,58 @@ import sqlite3
 import sys
 import os
 
+# Numeric column affinities keyed by table name; every other column is TEXT.
+# SQLite converts well-formed numeric text on insert and keeps anything else as-is.
+# year_span stays TEXT because it holds ranges such as "2003-2005".
+COLUMN_TYPES = {
+    'county_health_rankings': {
+        'measure_id': 'INTEGER',
+        'numerator': 'REAL',
+        'denominator': 'REAL',
+        'raw_value': 'REAL',
+        'confidence_interval_lower_bound': 'REAL',
+        'confidence_interval_upper_bound': 'REAL',
+        'data_release_year': 'INTEGER',
+    },
+    'zip_county': {
+        'zip_pop': 'INTEGER',
+        'zip_pop_in_county': 'REAL',
+        'n_counties': 'INTEGER',
+    },
+}
+
+# Tables created as STRICT, so a value that doesn't fit its column's type is an
+# error instead of being stored as text. Needs SQLite 3.37+ to build and to read.
+STRICT_TABLES = {'county_health_rankings'}
+
+# Physical row order keyed by table name. The rows are staged first and then
+# copied in this order, so the rows of one API lookup share a few adjacent pages.
+CLUSTER_ORDER = {
+    'county_health_rankings': ('county', 'state', 'measure_name', 'year_span DESC'),
+}
+
+# Multi-column indices keyed by table name: (index name, indexed columns)
+COMPOSITE_INDEXES = {
+    'county_health_rankings': [
+        ('idx_chr_county_measure', ('county', 'measure_name', 'year_span DESC')),
+    ],
+    'zip_county': [
+        # Covers the ZIP lookup so it never has to read the table itself
+        ('idx_zip_county_covering', ('zip', 'county', 'state_abbreviation', 'county_code')),
+    ],
+}
+
+# Connection settings for the load session: larger pages, no journal or fsync,
+# large page cache
+LOAD_PRAGMAS = (
+    # Only takes effect when the database file is new (before any table exists)
+    "PRAGMA page_size=8192",
+    "PRAGMA journal_mode=OFF",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-200000",
+)
+
 def main():
     # Check arguments
     if len(sys.argv) != 3:
@@ -16,51 +68,73 @@ def main():
     # Derive table name from CSV file name (strip directory and extension)
     table_name = os.path.splitext(os.path.basename(csv_file_name))[0]
     
+    # Identifiers can't be bound as parameters, so only allow plain names
+    if not table_name.isidentifier():
+        print(f"Error: '{table_name}' is not a valid table name", file=sys.stderr)
+        sys.exit(1)
+    
     # Connect (or create) the SQLite database
     conn = sqlite3.connect(database_name)
-    cursor = conn.cursor()
+    
+    # Bulk-load settings for this session only; a failed load should be re-run
+    for pragma in LOAD_PRAGMAS:
+        conn.execute(pragma)
     
     try:
-        # Read the CSV file
-        with open(csv_file_name, 'r', newline='', encoding='utf-8') as csvfile:
+        # Read the CSV file (utf-8-sig drops a leading byte-order mark from the header)
+        with open(csv_file_name, 'r', newline='', encoding='utf-8-sig') as csvfile:
             reader = csv.reader(csvfile)
             headers = [h.lower().strip().replace('.', '_').replace('-', '_').replace(' ', '_') for h in next(reader)] # sanitize SQL improve
             
+            # Load the whole file in a single transaction
+            conn.execute("BEGIN IMMEDIATE")
+            
             # Drop the table if it exists
-            cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+            conn.execute(f"DROP TABLE IF EXISTS {table_name}")
             
-            # Create table with TEXT columns
+            # Create table with numeric affinities where known, TEXT otherwise
+            column_types = COLUMN_TYPES.get(table_name, {})
             create_table_sql = f"CREATE TABLE {table_name} (" + \
-                             ", ".join([f"{col} TEXT" for col in headers]) + \
+                             ", ".join([f"{col} {column_types.get(col, 'TEXT')}" for col in headers]) + \
                              ")"
-            cursor.execute(create_table_sql)
+            if table_name in STRICT_TABLES and sqlite3.sqlite_version_info >= (3, 37, 0):
+                create_table_sql += " STRICT"
+            conn.execute(create_table_sql)
             
-            # Create indices for commonly queried columns
-            common_columns = {'zip', 'county', 'state', 'county_code', 'state_code', 'measure_name', 'fipscode'}
-            for col in headers:
-                if col.lower() in common_columns:
-                    cursor.execute(f"CREATE INDEX idx_{table_name}_{col} ON {table_name}({col})")
+            # Clustered tables are loaded into a staging table first
+            cluster_order = CLUSTER_ORDER.get(table_name)
+            insert_table = table_name
+            if cluster_order:
+                insert_table = "temp.staging"
+                conn.execute(f"CREATE TEMP TABLE staging AS SELECT * FROM {table_name} WHERE 0")
+            
+            # Insert data straight from the C csv reader; NULLIF turns empty strings
+            # into NULL inside SQLite so no per-row Python code runs
+            placeholders = ", ".join(["NULLIF(?, '')" for _ in headers])
+            insert_sql = f"INSERT INTO {insert_table} VALUES ({placeholders})"
+            conn.executemany(insert_sql, reader)
             
-            # Insert data
-            placeholders = ", ".join(["?" for _ in headers])
-            insert_sql = f"INSERT INTO {table_name} VALUES ({placeholders})"
+            if cluster_order:
+                conn.execute(f"INSERT INTO {table_name} SELECT * FROM temp.staging ORDER BY {', '.join(cluster_order)}")
+                conn.execute("DROP TABLE temp.staging")
             
-            # Insert in batches for better performance
-            batch_size = 1000
-            batch = []
+            # Create indices after the insert so the load doesn't maintain them row by row
+            composite_indexes = COMPOSITE_INDEXES.get(table_name, [])
             
-            for row in reader:
-                # Convert empty strings to None for better SQLite handling
-                processed_row = [val if val.strip() != '' else None for val in row]
-                batch.append(processed_row)
-                
-                if len(batch) >= batch_size:
-                    cursor.executemany(insert_sql, batch)
-                    batch = []
+            # Composite indices for the API's lookup patterns
+            for index_name, index_columns in composite_indexes:
+                conn.execute(f"CREATE INDEX {index_name} ON {table_name}({', '.join(index_columns)})")
+            
+            # Single-column indices for commonly queried columns, unless a
+            # composite index already leads with the column
+            common_columns = {'zip', 'county', 'state', 'county_code', 'state_code', 'measure_name', 'fipscode'}
+            leading_columns = {index_columns[0] for _, index_columns in composite_indexes}
+            for col in headers:
+                if col.lower() in common_columns and col not in leading_columns:
+                    conn.execute(f"CREATE INDEX idx_{table_name}_{col} ON {table_name}({col})")
             
-            # Insert any remaining rows
-            if batch:
-                cursor.executemany(insert_sql, batch)
+            # Refresh planner statistics so the new indices get picked
+            conn.execute("ANALYZE")
             
             conn.commit()
             